@@ -1,32 +1,30 @@
 import streamlit as st
 import sqlite3
+import calendar
 import pandas as pd
-from datetime import datetime
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-import joblib
+import numpy as np
 from streamlit_option_menu import option_menu
-import plotly.express as px
-import bcrypt
 from captcha.image import ImageCaptcha
-import random
+import secrets
 import string
 import smtplib
 from email.mime.text import MIMEText
 import ssl
+from concurrent.futures import ThreadPoolExecutor
+from database import get_connection, get_data_version
+from auth import hash_password, check_password
 
 # Set up page configuration
 st.set_page_config(page_title="ExpenseTrade", page_icon="🔒", layout="wide")
 
 # Connect to SQLite databases
-users_conn = sqlite3.connect("Main/data/users.db", check_same_thread=False)
+users_conn = get_connection("Main/data/users.db")
 users_cur = users_conn.cursor()
 
-expenses_conn = sqlite3.connect("Main/data/expenses.db", check_same_thread=False)
+expenses_conn = get_connection("Main/data/expenses.db")
 expenses_cur = expenses_conn.cursor()
 
-income_conn = sqlite3.connect("Main/data/income.db", check_same_thread=False)
+income_conn = get_connection("Main/data/income.db")
 income_cur = income_conn.cursor()
 
 # Create tables if they don't exist
@@ -51,6 +49,7 @@ CREATE TABLE IF NOT EXISTS expenses (
     FOREIGN KEY (owner) REFERENCES users(username)
 )
 ''')
+expenses_cur.execute("CREATE INDEX IF NOT EXISTS idx_expenses_owner_date ON expenses(owner, date DESC)")
 expenses_conn.commit()
 
 income_cur.execute('''
@@ -64,51 +63,134 @@ CREATE TABLE IF NOT EXISTS income (
     FOREIGN KEY (owner) REFERENCES users(username)
 )
 ''')
+income_cur.execute("CREATE INDEX IF NOT EXISTS idx_income_owner_date ON income(owner, date DESC)")
 income_conn.commit()
 
-# Helper functions
-def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def check_password(password, hashed):
-    try:
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-    except ValueError:
-        return False
+# Month names in calendar order, indexed by month number - 1
+MONTH_NAMES = list(calendar.month_name)[1:]
+MONTH_DTYPE = pd.CategoricalDtype(MONTH_NAMES, ordered=True)
 
+# Helper functions
 def generate_reset_code():
-    return str(random.randint(100000, 999999))
+    return f"{secrets.randbelow(900000) + 100000}"
 
 def generate_captcha_text():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))
+    return ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(5))
 
 def generate_captcha_image(captcha_text):
     image = ImageCaptcha()
     return image.generate_image(captcha_text)
 
+# Background worker for outgoing email, shared by all sessions
+@st.cache_resource
+def get_email_executor():
+    return ThreadPoolExecutor(max_workers=4)
+
 def send_reset_email(receiver_email, reset_code):
-    try:
-        # Fetch email user and password from Streamlit secrets
-        email_user = st.secrets["email"]["user"]
-        email_password = st.secrets["email"]["password"]
-        
-        # Create the email content
-        msg = MIMEText(f"Your password reset code is: {reset_code}")
-        msg["From"] = email_user
-        msg["To"] = receiver_email
-        msg["Subject"] = "Password Reset Request"
-
-        # Set up the SSL context and email server
-        context = ssl.create_default_context()
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls(context=context)  # Encrypt the connection
-            server.login(email_user, email_password)  # Login using the credentials
-            server.sendmail(email_user, receiver_email, msg.as_string())  # Send the email
-
-        return True
-    except Exception as e:
-        st.error(f"Failed to send reset email: {e}")
-        return False
+    # Runs on the email executor, so failures are raised and reported by the caller
+    # Fetch email user and password from Streamlit secrets
+    email_user = st.secrets["email"]["user"]
+    email_password = st.secrets["email"]["password"]
+
+    # Create the email content
+    msg = MIMEText(f"Your password reset code is: {reset_code}")
+    msg["From"] = email_user
+    msg["To"] = receiver_email
+    msg["Subject"] = "Password Reset Request"
+
+    # Set up the SSL context and email server
+    context = ssl.create_default_context()
+    with smtplib.SMTP("smtp.gmail.com", 587) as server:
+        server.starttls(context=context)  # Encrypt the connection
+        server.login(email_user, email_password)  # Login using the credentials
+        server.sendmail(email_user, receiver_email, msg.as_string())  # Send the email
+
+@st.fragment(run_every=1)
+def wait_for_reset_email():
+    # Polls the pending reset email and reruns the page once it finishes, so the result shows without user input
+    if st.session_state["reset_email_future"].done():
+        st.rerun()
+    st.info(f"Sending reset code to {st.session_state['reset_email']}...")
+
+# Aggregate the dashboard figures in SQL so only grouped rows reach pandas
+@st.cache_data(ttl=60)
+def get_dashboard_totals(username, data_version):
+    total_income = income_cur.execute(
+        "SELECT COALESCE(SUM(amount), 0) FROM income WHERE owner = ?", (username,)
+    ).fetchone()[0]
+    total_expense = expenses_cur.execute(
+        "SELECT COALESCE(SUM(amount), 0) FROM expenses WHERE owner = ?", (username,)
+    ).fetchone()[0]
+    return total_income, total_expense
+
+@st.cache_data(ttl=60)
+def get_dashboard_data(username, data_version):
+    # One pass per table: sum by calendar month (1-12, across all years) and source/category,
+    # then derive the per-month and per-source/category totals from those frames
+    income_by_month_source = pd.read_sql_query('''
+        SELECT CAST(strftime('%m', date) AS INTEGER) AS MonthNum, source AS Source, SUM(amount) AS Income
+        FROM income WHERE owner = ? GROUP BY MonthNum, source
+    ''', income_conn, params=(username,))
+    income_expense_grouped = pd.read_sql_query('''
+        SELECT CAST(strftime('%m', date) AS INTEGER) AS MonthNum, category AS Category, SUM(amount) AS Expense
+        FROM expenses WHERE owner = ? GROUP BY MonthNum, category ORDER BY MonthNum
+    ''', expenses_conn, params=(username,))
+
+    # Scatter the per-month sums into 12 calendar slots and keep the months that have data
+    income_months = income_by_month_source["MonthNum"].to_numpy(dtype=int) - 1
+    expense_months = income_expense_grouped["MonthNum"].to_numpy(dtype=int) - 1
+    has_data = np.bincount(np.concatenate([income_months, expense_months]), minlength=12) > 0
+    monthly_df = pd.DataFrame({
+        "Month": pd.Categorical(MONTH_NAMES, dtype=MONTH_DTYPE),
+        "Income": np.bincount(income_months, weights=income_by_month_source["Income"], minlength=12),
+        "Expense": np.bincount(expense_months, weights=income_expense_grouped["Expense"], minlength=12),
+    })[has_data]
+
+    income_grouped = income_by_month_source.groupby("Source", as_index=False)["Income"].sum()
+    expense_grouped = income_expense_grouped.groupby("Category", as_index=False)["Expense"].sum()
+
+    income_expense_grouped.insert(0, "Month", pd.Categorical.from_codes(income_expense_grouped["MonthNum"] - 1, dtype=MONTH_DTYPE))
+
+    return monthly_df, income_grouped, expense_grouped, income_expense_grouped
+
+# Build the selected dashboard chart once and cache it as figure JSON,
+# which is far cheaper to restore on rerun than rebuilding with plotly express
+@st.cache_data(ttl=60)
+def build_dashboard_chart(username, data_version, selected_chart):
+    import plotly.express as px
+
+    monthly_df, income_grouped, expense_grouped, income_expense_grouped = get_dashboard_data(username, data_version)
+
+    if selected_chart == "Trend":
+        # Create line chart for income and expense trends over months
+        fig = px.line(monthly_df, x='Month', y=['Income', 'Expense'], title='Income and Expense over Months')
+        fig.update_layout(xaxis_title='Month', yaxis_title='Amount (INR)', template='plotly_dark')
+
+    elif selected_chart == "By Source":
+        # Bar plot for total income by source
+        fig = px.bar(income_grouped, x='Source', y='Income', title='Total Income by Source', color='Source')
+        fig.update_layout(xaxis_title='Source', yaxis_title='Total Income (INR)', template='plotly_dark')
+
+    elif selected_chart == "By Category":
+        # Bar plot for total expenses by category
+        fig = px.bar(expense_grouped, x='Category', y='Expense', title='Total Expenses by Category', color='Category')
+        fig.update_layout(xaxis_title='Category', yaxis_title='Total Expenses (INR)', template='plotly_dark')
+
+    else:
+        # Stacked bar chart: Income and Expense by Month and Category
+        fig = px.bar(
+            income_expense_grouped,
+            x="Month",
+            y=["Expense"],
+            color="Category",
+            title="Income and Expense by Month and Category",
+            barmode="stack",
+            labels={"value": "Amount (INR)", "variable": "Type", "Month": "Month"},
+            category_orders={"Month": MONTH_NAMES},
+        )
+        fig.update_layout(xaxis_title="Month", yaxis_title="Total Amount (INR)", template='plotly_dark')
+
+    return fig.to_json()
 
 # Initialize session state
 if "user" not in st.session_state:
@@ -222,12 +304,12 @@ if not st.session_state["user"]:
                             reset_code = generate_reset_code()
                             st.session_state["reset_code"] = reset_code
                             st.session_state["reset_username"] = username
-                            if send_reset_email(user_email[0], reset_code):
-                                st.success(f"Password reset code sent to {user_email[0]}.")
-                                st.session_state["reset_stage"] = "enter_code"  
-                                st.rerun()
-                            else:
-                                st.error("Failed to send reset email. Please try again.")
+                            st.session_state["reset_email"] = user_email[0]
+                            st.session_state["reset_email_future"] = get_email_executor().submit(
+                                send_reset_email, user_email[0], reset_code
+                            )
+                            st.session_state["reset_stage"] = "enter_code"
+                            st.rerun()
                         else:
                             st.error("Username not found.")
 
@@ -235,6 +317,20 @@ if not st.session_state["user"]:
             st.success("Password reset successful! You can now log in.")
             
         elif st.session_state.get("reset_stage") == "enter_code":
+            email_future = st.session_state["reset_email_future"]
+            if not email_future.done():
+                wait_for_reset_email()
+            elif email_future.exception() is not None:
+                # The code never arrived, so there is nothing to enter; start over from the username form
+                st.error(f"Failed to send reset email: {email_future.exception()}")
+                st.session_state["reset_code"] = None
+                st.session_state["reset_stage"] = None
+                st.session_state["reset_email_future"] = None
+                st.button("Try again")
+                st.stop()
+            else:
+                st.success(f"Password reset code sent to {st.session_state['reset_email']}.")
+
             with st.form("reset_password_form"):
                 reset_code_input = st.text_input("Enter the reset code sent to your email")
                 new_password = st.text_input("Enter your new password", type="password")
@@ -271,23 +367,21 @@ if not st.session_state["user"]:
         st.write("Use the navigation menu on the left to sign up or log in.")
 
 else:
+    # Plotly is only needed once the dashboard is shown
+    import plotly.io as pio
+
     st.title(f"Welcome, {st.session_state['user']}!")
     st.header("This is your Dashboard!")
     st.divider()
 
     try:
-        # Fetch income and expense data for the logged-in user
+        # Fetch aggregated income and expense data for the logged-in user
         username = st.session_state["username"]
+        # Bumped by every income/expense add or edit, so cached dashboard data is never stale
+        data_version = get_data_version(username)
+        total_income, total_expense = get_dashboard_totals(username, data_version)
 
-        # Fetch income data from income.db
-        income_data = income_cur.execute("SELECT date, amount, source, description FROM income WHERE owner = ?", (username,)).fetchall()
-
-        # Fetch expense data from expenses.db
-        expense_data = expenses_cur.execute("SELECT date, amount, category, description FROM expenses WHERE owner = ?", (username,)).fetchall()
-
-        # Calculate total income, total expense, and remaining balance
-        total_income = sum(data[1] for data in income_data)
-        total_expense = sum(data[1] for data in expense_data)
+        # Calculate remaining balance
         remaining = total_income - total_expense
 
         # Display income, expense, and remaining balance
@@ -296,72 +390,20 @@ else:
         col2.metric("Total Expense:", f"{total_expense:,.1f} INR")
         col3.metric("Total Remaining:", f"{remaining:,.1f} INR")
 
-        # Convert fetched data into pandas DataFrame for processing
-        income_df = pd.DataFrame(income_data, columns=["Date", "Income", "Source", "Description"])
-        expense_df = pd.DataFrame(expense_data, columns=["Date", "Expense", "Category", "Description"])
-
-        # Merge income and expense data
-        merged_df = pd.concat([income_df, expense_df], axis=0)
-
-        # Extract month from the date for grouping
-        merged_df["Month"] = pd.to_datetime(merged_df["Date"]).dt.month_name()
-
-        # Group by month and sum the amounts
-        grouped_df = merged_df.groupby("Month").sum().reset_index()
-
-        # Define the order for months
-        month_order = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
-
-        # Set the "Month" column as a categorical variable with the specified order
-        merged_df["Month"] = pd.Categorical(merged_df["Month"], categories=month_order, ordered=True)
-
-        # Create line chart for income and expense trends over months
-        fig = px.line(grouped_df, x='Month', y=['Income', 'Expense'], title='Income and Expense over Months')
-        fig.update_layout(xaxis_title='Month', yaxis_title='Amount (INR)', template='plotly_dark')
-
-        # Group income by source for the bar plot
-        income_grouped = income_df.groupby("Source").sum().reset_index()
-
-        # Bar plot for total income by source
-        fig2 = px.bar(income_grouped, x='Source', y='Income', title='Total Income by Source', color='Source')
-        fig2.update_layout(xaxis_title='Source', yaxis_title='Total Income (INR)', template='plotly_dark')
-
-        # Group expense by category for the bar plot
-        expense_grouped = expense_df.groupby("Category").sum().reset_index()
-
-        # Bar plot for total expenses by category
-        fig3 = px.bar(expense_grouped, x='Category', y='Expense', title='Total Expenses by Category', color='Category')
-        fig3.update_layout(xaxis_title='Category', yaxis_title='Total Expenses (INR)', template='plotly_dark')
-
-        # Scatter plot for Income vs Expense by Category
-        income_expense_grouped = merged_df.groupby(["Month", "Category"]).sum().reset_index()
-
-        # Stacked bar chart: Income and Expense by Month and Category
-        fig4 = px.bar(
-            income_expense_grouped,
-            x="Month",
-            y=["Income", "Expense"],
-            color="Category",
-            title="Income and Expense by Month and Category",
-            barmode="stack",
-            labels={"value": "Amount (INR)", "variable": "Type", "Month": "Month"},
-        )
-        fig4.update_layout(xaxis_title="Month", yaxis_title="Total Amount (INR)", template='plotly_dark')
-
-        # Layout for the charts: Using columns to split them nicely
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.plotly_chart(fig)  # Line chart: Income vs Expense over months
-
-        with col2:
-            st.plotly_chart(fig2)  # Bar chart: Total Income by Source
-
-        with col1:
-            st.plotly_chart(fig3)  # Bar chart: Total Expenses by Category
-
-        with col2:
-            st.plotly_chart(fig4)  # Scatter plot: Income vs Expense by Category
+        # Only fetch the grouped chart data when there is something to plot
+        if not (total_income or total_expense):
+            st.info("Add income or expenses to see your dashboard charts.")
+        else:
+            # Only the selected chart is built on each rerun
+            selected_chart = option_menu(
+                menu_title=None,
+                options=["Trend", "By Source", "By Category", "By Month & Category"],
+                icons=["graph-up", "wallet2", "tags", "bar-chart"],
+                orientation="horizontal",
+            )
+
+            fig = pio.from_json(build_dashboard_chart(username, data_version, selected_chart))
+            st.plotly_chart(fig)
 
     except Exception as e:
         st.error("Dashboard cannot be loaded when your TOTAL EXPENSE is NOT set(0.00)")
\ No newline at end of file
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import joblib
+import pandas as pd
+
+# Paths for the category dataset and the persisted model
+DATASET_PATH = "Main/data/categories_dataset.csv"
+VECTORIZER_PATH = "Main/models/vectorizer.pkl"
+MODEL_PATH = "Main/models/model.pkl"
+DATASET_HASH_PATH = "Main/models/model.sha"
+
+def dataset_sha256():
+    """Hash the category dataset so the saved model can be matched to it."""
+    with open(DATASET_PATH, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def saved_model_is_fresh(dataset_hash):
+    """Check whether the pickled model exists and was trained on the current dataset."""
+    if not all(os.path.exists(path) for path in (VECTORIZER_PATH, MODEL_PATH, DATASET_HASH_PATH)):
+        return False
+    with open(DATASET_HASH_PATH) as f:
+        return f.read().strip() == dataset_hash
+
+def train_model(dataset_hash=None):
+    """Fit the vectorizer and model on the category dataset and save them next to its hash."""
+    # Training dependencies are only imported when a model is actually fitted
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+
+    if dataset_hash is None:
+        dataset_hash = dataset_sha256()
+
+    df = pd.read_csv(DATASET_PATH)
+
+    # Data preparation
+    X = df['description']
+    y = df['category']
+
+    # Text vectorization: hash tokens straight to feature indices (no vocabulary) and apply TF-IDF weights
+    vectorizer = make_pipeline(
+        HashingVectorizer(n_features=2**14, alternate_sign=False, norm=None),
+        TfidfTransformer(sublinear_tf=True),
+    )
+    X_vec = vectorizer.fit_transform(X)
+
+    # Train a linear model so single-description predictions are one sparse dot product
+    model = LogisticRegression(solver="liblinear", C=10, max_iter=200)
+    model.fit(X_vec, y)
+
+    # Save vectorizer and model so later cold starts can skip training
+    joblib.dump(vectorizer, VECTORIZER_PATH, compress=3)
+    joblib.dump(model, MODEL_PATH, compress=3)
+    with open(DATASET_HASH_PATH, "w") as f:
+        f.write(dataset_hash)
+
+    return vectorizer, model
+
+def load_model():
+    """Load the shipped vectorizer and model, training them only when missing or out of date."""
+    dataset_hash = dataset_sha256()
+    if saved_model_is_fresh(dataset_hash):
+        try:
+            return joblib.load(VECTORIZER_PATH), joblib.load(MODEL_PATH)
+        except Exception:
+            # Unreadable or incompatible pickles (e.g. another scikit-learn version); retrain below
+            pass
+    return train_model(dataset_hash)
+
+if __name__ == "__main__":
+    # Retrain after editing the dataset, from the repository root: python Main/categorizer.py
+    train_model()
@@ -0,0 +1,46 @@
+import sqlite3
+import itertools
+import streamlit as st
+
+def connect_to_db(db_path):
+    """
+    Connect to SQLite database with Write-Ahead Logging (WAL) enabled.
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
+    conn.execute("PRAGMA journal_mode=WAL;")  # Enable WAL mode for concurrency
+    conn.execute("PRAGMA synchronous=NORMAL;")  # Reduce synchronous overhead
+    conn.execute("PRAGMA temp_store=MEMORY;")  # Keep temp tables and indices in memory
+    conn.execute("PRAGMA cache_size=-20000;")  # Use a ~20 MB page cache
+    conn.execute("PRAGMA mmap_size=268435456;")  # Read pages through a 256 MB memory map
+    return conn
+
+def get_connection(db_path):
+    """
+    Return the current session's connection to a database, opening it on first use.
+    Pages rerun on every interaction, so connections are kept in session state
+    rather than reopened each time.
+    """
+    connections = st.session_state.setdefault("db_connections", {})
+    if db_path not in connections:
+        connections[db_path] = connect_to_db(db_path)
+    return connections[db_path]
+
+@st.cache_resource
+def _data_versions():
+    # Shared by every session, so a write in one session is seen by cached reads in all of them
+    return {"counter": itertools.count(1), "owners": {}}
+
+def get_data_version(owner):
+    """
+    Return the change marker for a user's income and expense rows.
+    Cached reads include it in their key so they refresh after any add or edit.
+    """
+    return _data_versions()["owners"].get(owner, 0)
+
+def bump_data_version(owner):
+    """
+    Record that a user's income or expense rows changed.
+    Call after every insert or update to those tables.
+    """
+    versions = _data_versions()
+    versions["owners"][owner] = next(versions["counter"])
@@ -1,26 +1,26 @@
 import streamlit as st
 import sqlite3
+import os
 import pandas as pd
 import calendar
+import math
 from datetime import datetime
 from streamlit_option_menu import option_menu
 import plotly.express as px
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-import joblib
 import numpy as np
 from sklearn.linear_model import LinearRegression
+from database import get_connection, get_data_version, bump_data_version
+from categorizer import DATASET_PATH, load_model
 
 # Connect to SQLite database
 if "user" not in st.session_state or st.session_state["user"] is None:
     st.warning("Please log in to access this page.")
     st.stop()
 
-expenses_conn = sqlite3.connect('Main/data/expenses.db', check_same_thread=False)
+expenses_conn = get_connection('Main/data/expenses.db')
 expenses_cur = expenses_conn.cursor()
 
-income_conn = sqlite3.connect('Main/data/income.db', check_same_thread=False)
+income_conn = get_connection('Main/data/income.db')
 income_cur = income_conn.cursor()
 
 # Create Expenses table if it doesn't exist
@@ -33,6 +33,7 @@ CREATE TABLE IF NOT EXISTS expenses (
     category TEXT, 
     description TEXT 
 ) ''')
+expenses_cur.execute("CREATE INDEX IF NOT EXISTS idx_expenses_owner_date ON expenses(owner, date DESC)")
 expenses_conn.commit()
 
 # Create Income table if it doesn't exist
@@ -45,38 +46,32 @@ CREATE TABLE IF NOT EXISTS income (
     source TEXT, 
     description TEXT 
 ) ''')
+income_cur.execute("CREATE INDEX IF NOT EXISTS idx_income_owner_date ON income(owner, date DESC)")
 income_conn.commit()
 
 # Set default expense limit
 DEFAULT_EXPENSE_LIMIT = 1000
 
-# Load dataset and train model
+# Load the shipped model once per process; training only happens when it is missing or out of date.
+# The dataset mtime is part of the cache key so an edited dataset is picked up.
 @st.cache_resource
-def load_and_train_model():
-    df = pd.read_csv("Main/data/categories_dataset.csv")
+def load_and_train_model(dataset_mtime):
+    return load_model()
 
-    # Data preparation
-    X = df['description']
-    y = df['category']
+dataset_mtime = os.path.getmtime(DATASET_PATH)
+vectorizer, model = load_and_train_model(dataset_mtime)
 
-    # Text vectorization
-    vectorizer = TfidfVectorizer()
-    X_vec = vectorizer.fit_transform(X)
+# Categories offered in the Add Expense form after the predicted one
+CATEGORIES = ("Food", "Transport", "Entertainment", "Bills", "Others")
 
-    # Train/test split
-    X_train, X_test, y_train, y_test = train_test_split(X_vec, y, test_size=0.2, random_state=42)
+# Skip predicting on descriptions shorter than this
+MIN_PREDICTION_LENGTH = 3
 
-    # Train model
-    model = RandomForestClassifier()
-    model.fit(X_train, y_train)
-
-    # Save vectorizer and model for later use
-    joblib.dump(vectorizer, "Main/models/vectorizer.pkl")
-    joblib.dump(model, "Main/models/model.pkl")
-
-    return vectorizer, model
-
-vectorizer, model = load_and_train_model()
+# Cache predictions so reruns only re-predict new descriptions.
+# Keyed on the same dataset mtime as the model, so a retrain drops stale predictions.
+@st.cache_data(max_entries=512, show_spinner=False)
+def predict_category(description, dataset_mtime):
+    return model.predict(vectorizer.transform([description]))[0]
 
 with st.sidebar:
     st.image("Main/assets/expense.png", use_container_width=True)
@@ -95,29 +90,77 @@ def has_income(owner):
         st.error(f"An error occurred: {e}")
         return False
 
-# Helper function to fetch historical expense data
+# Number of expenses shown per Expense History page
+HISTORY_PAGE_SIZE = 5
+
+# Expense History sort options mapped to their ORDER BY clauses
+HISTORY_SORT_ORDERS = {
+    "Date (Newest First)": "date DESC",
+    "Date (Oldest First)": "date ASC",
+    "Amount (High to Low)": "amount DESC",
+    "Amount (Low to High)": "amount ASC",
+    "Sr No": "id ASC",
+}
+
+# SQL for the hot insert/count paths, kept as constants so the connection's
+# statement cache reuses the prepared statements
+INSERT_EXPENSE_SQL = '''
+INSERT INTO expenses (owner, amount, date, category, description)
+VALUES (?, ?, ?, ?, ?)
+'''
+COUNT_EXPENSES_SQL = "SELECT COUNT(*) FROM expenses WHERE owner = ?"
+
+# Expense History page queries, one per sort option
+HISTORY_PAGE_SQL = {
+    sort_order: f'''
+    SELECT ROW_NUMBER() OVER (ORDER BY id) AS "Sr No", amount AS Amount, date AS Date,
+           category AS Category, description AS Description
+    FROM expenses
+    WHERE owner = ?
+    ORDER BY {order_by}, id
+    LIMIT ? OFFSET ?
+    '''
+    for sort_order, order_by in HISTORY_SORT_ORDERS.items()
+}
+
+# Helper function to insert one or more expenses in a single transaction
+def add_expenses(owner, rows):
+    with expenses_conn:
+        expenses_cur.executemany(INSERT_EXPENSE_SQL, [(owner, *row) for row in rows])
+    bump_data_version(owner)
+
+# Helper function to count a user's expenses for pagination.
+# data_version is only part of the cache key, so any add or edit (from any page) refreshes it.
+@st.cache_data(ttl=30, show_spinner=False)
+def count_expenses(owner, data_version):
+    return expenses_cur.execute(COUNT_EXPENSES_SQL, (owner,)).fetchone()[0]
+
+# Helper function to fetch one sorted page of a user's expenses
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_expense_page(owner, data_version, sort_order, page):
+    offset = (page - 1) * HISTORY_PAGE_SIZE
+    return pd.read_sql_query(HISTORY_PAGE_SQL[sort_order], expenses_conn, params=(owner, HISTORY_PAGE_SIZE, offset))
+
+# Helper function to fetch historical monthly expense totals
 def fetch_expense_data(owner):
     query = '''
-    SELECT date, SUM(amount) AS total_expense
+    SELECT strftime('%Y-%m', date) AS Month, SUM(amount) AS "Total Expense"
     FROM expenses
     WHERE owner = ?
-    GROUP BY date
-    ORDER BY date
+    GROUP BY Month
+    ORDER BY Month
     '''
-    return expenses_cur.execute(query, (owner,)).fetchall()
+    return pd.read_sql_query(query, expenses_conn, params=(owner,))
 
 # Helper function to forecast expenses
 def forecast_expenses(expense_data):
-    if not expense_data:
+    if expense_data.empty:
         return None, None
 
-    df = pd.DataFrame(expense_data, columns=["Date", "Total Expense"])
-    df['Date'] = pd.to_datetime(df['Date'])
-    df['Month'] = df['Date'].dt.to_period('M').astype(str)
-    df_grouped = df.groupby('Month')['Total Expense'].sum().reset_index()
+    df_grouped = expense_data
     df_grouped['Month Index'] = np.arange(len(df_grouped))
 
-    X = df_grouped[['Month Index']]
+    X = df_grouped[['Month Index']].to_numpy()
     y = df_grouped['Total Expense']
     model = LinearRegression()
     model.fit(X, y)
@@ -139,9 +182,16 @@ def main():
         st.warning("Please add income in your profile before managing expenses.")
         return
 
-    tab_1, tab_2, tab_3, tab_4 = st.tabs(["Manage Expense", "Expense History", "Expense Summary", "Expense Forecast"])
+    # Only the selected section runs, so typing in the Add Expense form doesn't rerun the
+    # history, summary and forecast queries (st.tabs executes every tab on each rerun)
+    selected_section = option_menu(
+        menu_title=None,
+        options=["Manage Expense", "Expense History", "Expense Summary", "Expense Forecast"],
+        icons=["wallet2", "clock-history", "pie-chart", "graph-up"],
+        orientation="horizontal",
+    )
 
-    with tab_1:
+    if selected_section == "Manage Expense":
         st.title("Manage Expense")
 
         menu_action = option_menu(
@@ -159,13 +209,11 @@ def main():
                 description = st.text_area("Description")
                 predicted_category = ""
 
-                if description:
-                    description_vec = vectorizer.transform([description])
-                    predicted_category = model.predict(description_vec)[0]
+                if len(description.strip()) >= MIN_PREDICTION_LENGTH:
+                    predicted_category = predict_category(description.strip(), dataset_mtime)
 
-                category = st.selectbox(
-                    "Category", [predicted_category] + ["Food", "Transport", "Entertainment", "Bills", "Others"] if predicted_category else ["  ","Food", "Transport", "Entertainment", "Bills", "Others"],
-                )
+                options = (predicted_category, *CATEGORIES) if predicted_category else CATEGORIES
+                category = st.selectbox("Category", options, index=0)
 
                 expense_date = st.date_input("Expense Date", max_value=datetime.now().date())
 
@@ -179,12 +227,7 @@ def main():
                     else:
                         try:
                             # Insert expense into the database
-                            query = '''
-                            INSERT INTO expenses (owner, amount, date, category, description)
-                            VALUES (?, ?, ?, ?, ?)
-                            '''
-                            expenses_cur.execute(query, (owner, amount, expense_date, category, description))
-                            expenses_conn.commit()
+                            add_expenses(owner, [(amount, expense_date, category, description)])
 
                             st.success("Expense added successfully!")
                         except sqlite3.Error as e:
@@ -193,11 +236,12 @@ def main():
         elif menu_action == "Edit Expense":
             st.subheader("Edit Expense")
 
-            # Fetch all expenses for the logged-in user
+            # Fetch all expenses for the logged-in user, in id order so Sr No matches Expense History
             query = '''
             SELECT id, amount, date, category, description
             FROM expenses
             WHERE owner = ?
+            ORDER BY id
             '''
             expenses = expenses_cur.execute(query, (owner,)).fetchall()
 
@@ -242,46 +286,32 @@ def main():
                                         '''
                                         expenses_cur.execute(update_query, (amount, expense_date, category, description, expense_id))
                                         expenses_conn.commit()
+                                        bump_data_version(owner)
                                         st.success("Expense updated successfully!")
                                         st.rerun()  # Rerun the app to reflect changes
                                     except Exception as e:
                                         st.error(f"An error occurred: {e}")
 
-    with tab_2:
+    elif selected_section == "Expense History":
         st.title("Expense History")
 
-        query = '''
-        SELECT id, amount, date, category, description
-        FROM expenses
-        WHERE owner = ?
-        '''
-        expenses = expenses_cur.execute(query, (owner,)).fetchall()
+        data_version = get_data_version(owner)
+        total_expenses = count_expenses(owner, data_version)
 
-        if not expenses:
+        if not total_expenses:
             st.warning("No expenses found.")
         else:
-            columns = ["ID", "Amount", "Date", "Category", "Description"]
-            expenses_df = pd.DataFrame(expenses, columns=columns)
-
-            # Add serial numbers
-            expenses_df.insert(0, "Sr No", range(1, len(expenses_df) + 1))
-            display_df = expenses_df.drop(columns=["ID"])
-
-            # Sorting
-            sort_order = st.selectbox( 
-                "Sort by:",
-                ["Date (Newest First)", "Date (Oldest First)", "Amount (High to Low)", "Amount (Low to High)", "Sr No"],
-            )
-
-            if "Date" in sort_order:
-                display_df = display_df.sort_values(by="Date", ascending="Oldest" in sort_order)
-            elif "Amount" in sort_order:
-                display_df = display_df.sort_values(by="Amount", ascending="Low to High" in sort_order)
-                
-            
-            st.write(display_df.to_html(index=False), unsafe_allow_html=True)
-
-    with tab_3:
+            # Sorting and pagination are done in SQL so only the visible page is fetched
+            sort_order = st.selectbox("Sort by:", list(HISTORY_SORT_ORDERS))
+            total_pages = math.ceil(total_expenses / HISTORY_PAGE_SIZE)
+            page = st.number_input("Page", min_value=1, max_value=total_pages, step=1)
+
+            display_df = fetch_expense_page(owner, data_version, sort_order, page)
+
+            st.dataframe(display_df, hide_index=True, use_container_width=True)
+            st.caption(f"Page {page} of {total_pages}")
+
+    elif selected_section == "Expense Summary":
         st.title("Expense Summary")
 
         income_periods = income_cur.execute(
@@ -303,24 +333,22 @@ def main():
                 start_date = f"{selected_period}-01"
                 end_date = f"{selected_period}-{calendar.monthrange(int(selected_period[:4]), int(selected_period[5:7]))[1]}"
 
-                income_cur.execute(''' 
-                    SELECT SUM(i.amount), i.source 
-                    FROM income i 
-                    WHERE i.owner = ? AND i.date BETWEEN ? AND ?
-                    GROUP BY i.source
-                ''', (owner, start_date, end_date))
-                income_data = income_cur.fetchall()
-
-                expenses_cur.execute(''' 
-                    SELECT SUM(amount), category 
-                    FROM expenses 
+                income_df = pd.read_sql_query('''
+                    SELECT SUM(amount) AS Amount, source AS Source
+                    FROM income
+                    WHERE owner = ? AND date BETWEEN ? AND ?
+                    GROUP BY source
+                ''', income_conn, params=(owner, start_date, end_date))
+
+                expense_df = pd.read_sql_query('''
+                    SELECT SUM(amount) AS Amount, category AS Category
+                    FROM expenses
                     WHERE owner = ? AND date BETWEEN ? AND ?
                     GROUP BY category
-                ''', (owner, start_date, end_date))
-                expense_data = expenses_cur.fetchall()
+                ''', expenses_conn, params=(owner, start_date, end_date))
 
-                total_income = sum([data[0] for data in income_data])
-                total_expense = sum([data[0] for data in expense_data])
+                total_income = income_df["Amount"].sum()
+                total_expense = expense_df["Amount"].sum()
                 remaining = total_income - total_expense
 
                 col1, col2, col3 = st.columns(3)
@@ -328,9 +356,6 @@ def main():
                 col2.metric("Total Expense:", f"{total_expense:,.1f} INR")
                 col3.metric("Total Remaining:", f"{remaining:,.1f} INR")
 
-                income_df = pd.DataFrame(income_data, columns=['Amount', 'Source'])
-                expense_df = pd.DataFrame(expense_data, columns=['Amount', 'Category'])
-
                 fig1 = px.pie(income_df, values='Amount', names='Source', title="Income Breakdown")
                 fig2 = px.pie(expense_df, values='Amount', names='Category', title="Expense Breakdown")
 
@@ -343,7 +368,7 @@ def main():
                 st.subheader("Detailed Expense Data")
                 st.table(expense_df)
 
-    with tab_4:
+    elif selected_section == "Expense Forecast":
         st.title("Expense Forecast")
         expense_data = fetch_expense_data(owner)
         historical_data, forecast_data = forecast_expenses(expense_data)
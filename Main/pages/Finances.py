@@ -1,14 +1,11 @@
-from matplotlib import pyplot as plt
 import streamlit as st
 import yfinance as yf
 import pandas as pd
-import sqlite3
 from datetime import datetime, timedelta
 import numpy as np
-from sklearn.linear_model import LinearRegression
 import plotly.express as px
 from streamlit_option_menu import option_menu
-from prophet import Prophet
+from database import get_connection, bump_data_version
 
 # Streamlit page setup
 st.set_page_config(layout="wide")
@@ -26,10 +23,10 @@ with st.sidebar:
             st.rerun()
 
 # Connect to SQLite databases
-expenses_conn = sqlite3.connect('Main/data/expenses.db', check_same_thread=False)
+expenses_conn = get_connection('Main/data/expenses.db')
 expenses_cur = expenses_conn.cursor()
 
-income_conn = sqlite3.connect('Main/data/income.db', check_same_thread=False)
+income_conn = get_connection('Main/data/income.db')
 income_cur = income_conn.cursor()
 
 # Create stock_purchases table if it doesn't exist
@@ -49,25 +46,25 @@ CREATE TABLE IF NOT EXISTS stock_purchases (
 ''')
 expenses_conn.commit()
 
-# Add or update stock purchases
 # Add or update stock purchases
 def add_stock_purchase(owner, stock_symbol, stock_name, purchase_date, quantity, purchase_price):
-    # Insert into stock_purchases table
-    expenses_cur.execute('''
-        INSERT INTO stock_purchases (owner, stock_symbol, stock_name, purchase_date, quantity, purchase_price)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (owner, stock_symbol, stock_name, purchase_date, quantity, purchase_price))
-    expenses_conn.commit()
-    
     # Calculate total purchase cost
     total_cost = quantity * purchase_price
 
-    # Add to expenses table
-    expenses_cur.execute('''
-        INSERT INTO expenses (owner, date, amount, category, description)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (owner, purchase_date, total_cost, "Stocks", stock_name))
-    expenses_conn.commit()
+    # Record the purchase and its expense in a single transaction
+    with expenses_conn:
+        # Insert into stock_purchases table
+        expenses_cur.execute('''
+            INSERT INTO stock_purchases (owner, stock_symbol, stock_name, purchase_date, quantity, purchase_price)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (owner, stock_symbol, stock_name, purchase_date, quantity, purchase_price))
+
+        # Add to expenses table
+        expenses_cur.execute('''
+            INSERT INTO expenses (owner, date, amount, category, description)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (owner, purchase_date, total_cost, "Stocks", stock_name))
+    bump_data_version(owner)
 
 
 def sell_stock(stock_id, sell_price, sell_date):
@@ -78,23 +75,24 @@ def sell_stock(stock_id, sell_price, sell_date):
     ''', (sell_price, sell_date, stock_id))
     expenses_conn.commit()
 
-# Fetch income and expense data
-def get_income_data(owner):
+# Fetch income and expense totals
+def get_total_income(owner):
     return income_cur.execute(
-        "SELECT date, amount, source, description FROM income WHERE owner = ?", (owner,)
-    ).fetchall()
+        "SELECT COALESCE(SUM(amount), 0) FROM income WHERE owner = ?", (owner,)
+    ).fetchone()[0]
 
-def get_expense_data(owner):
+def get_total_expense(owner):
     return expenses_cur.execute(
-        "SELECT date, amount, category, description FROM expenses WHERE owner = ?", (owner,)
-    ).fetchall()
+        "SELECT COALESCE(SUM(amount), 0) FROM expenses WHERE owner = ?", (owner,)
+    ).fetchone()[0]
 
 def get_stock_data(owner):
-    return expenses_cur.execute('''
-        SELECT stock_symbol, stock_name, purchase_date, quantity, purchase_price
+    return pd.read_sql_query('''
+        SELECT stock_symbol AS Symbol, stock_name AS Name, purchase_date AS "Purchase Date",
+               quantity AS Quantity, purchase_price AS "Purchase Price"
         FROM stock_purchases
         WHERE owner = ?
-    ''', (owner,)).fetchall()
+    ''', expenses_conn, params=(owner,))
 
 # Fetch and cache stock prices
 @st.cache_data(ttl=3600)
@@ -110,6 +108,11 @@ def fetch_stock_prices(symbols):
             stock_prices[symbol] = None
     return stock_prices
 
+# Fetch and cache a ticker's price history, so reruns don't repeat the Yahoo Finance request
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_ticker_history(symbol, **history_args):
+    return yf.Ticker(symbol).history(**history_args)
+
 # Load company data
 @st.cache_data
 def load_company_data():
@@ -122,11 +125,21 @@ ticker_symbols = company_data["Symbol"].tolist()
 # Get the logged-in user's username
 username = st.session_state["username"]
 
-# Create tabs
-tab1, tab2, tab3, tab4 = st.tabs(["Stock Prices", "Savings & Suggestions", "Stock Purchase", "Stock Forecast"])
+# Remaining balance, used by both the suggestions and purchase sections
+total_income = get_total_income(username)
+total_expense = get_total_expense(username)
+remaining = total_income - total_expense
+
+# Only the selected section runs, so its charts and forecasts aren't built while another is viewed
+selected_section = option_menu(
+    menu_title=None,
+    options=["Stock Prices", "Savings & Suggestions", "Stock Purchase", "Stock Forecast"],
+    icons=["graph-up", "piggy-bank", "cart-plus", "magic"],
+    orientation="horizontal",
+)
 
 # Tab 1: Stock Prices
-with tab1:
+if selected_section == "Stock Prices":
     st.title("Stock Prices")
 
     company_names = company_data["Company_Name"].tolist()
@@ -136,8 +149,10 @@ with tab1:
     st.write("Selected Ticker Symbol:", selected_ticker_symbol)
 
     if selected_ticker_symbol:
-        tickerData = yf.Ticker(selected_ticker_symbol)
-        tickerDf = tickerData.history(period='1d', start='2024-01-01', end=datetime.today())
+        # End on tomorrow's date (exclusive) so today's prices are included and the cache key only changes daily
+        tickerDf = fetch_ticker_history(
+            selected_ticker_symbol, period='1d', start='2024-01-01', end=datetime.today().date() + timedelta(days=1)
+        )
 
         if not tickerDf.empty:
             st.metric("Closing Price", f"{tickerDf['Close'].iloc[-1]:.2f}")
@@ -159,7 +174,8 @@ with tab1:
 
             support_level = tickerDf['Close'].min()
 
-            # prediction model (e.g., linear regression)
+            # prediction model (e.g., linear regression); sklearn is only imported for this section
+            from sklearn.linear_model import LinearRegression
             X = np.arange(len(tickerDf)).reshape(-1, 1)
             y = tickerDf['Close'].values
             model = LinearRegression().fit(X, y)
@@ -178,16 +194,8 @@ with tab1:
             st.warning("No data available for the entered symbol. Please try again.")
 
 # Tab 2: Savings & Stock Predictions
-with tab2:
+elif selected_section == "Savings & Suggestions":
     st.title("Savings & Stock Suggestions")
-    
-    # Fetch income and expense data to calculate remaining balance
-    income_data = get_income_data(username)
-    expense_data = get_expense_data(username)
-
-    total_income = sum(data[1] for data in income_data)
-    total_expense = sum(data[1] for data in expense_data)
-    remaining = total_income - total_expense
 
     # Display total savings
     st.metric("Total Savings", f"{remaining:,.1f} INR")
@@ -224,7 +232,7 @@ with tab2:
 
 
 # Tab 3: Stock Purchase
-with tab3:
+elif selected_section == "Stock Purchase":
     st.title("Stock Purchase")
     st.header("Add a New Stock Purchase")
 
@@ -277,30 +285,24 @@ with tab3:
 
     # Display existing purchases
     st.header("Your Stock Purchases")
-    stock_data = get_stock_data(username)
-    stock_df = pd.DataFrame(
-        stock_data, 
-        columns=["Symbol", "Name", "Purchase Date", "Quantity", "Purchase Price"]
-    )
+    stock_df = get_stock_data(username)
     if not stock_df.empty:
         st.table(stock_df)
     else:
         st.warning("No stock purchases found.")
 
 # Tab 4: Stock Forecast
-with tab4:
+elif selected_section == "Stock Forecast":
     st.title("Stock Forecast")
 
     # Fetch purchased stock symbols
-    stock_data = get_stock_data(username)
-    purchased_symbols = [stock[0] for stock in stock_data]  # Extract stock symbols
+    purchased_symbols = get_stock_data(username)["Symbol"].tolist()  # Extract stock symbols
 
     if purchased_symbols:
         selected_stock = st.selectbox("Select a stock to forecast:", purchased_symbols)
 
         if selected_stock:
-            ticker = yf.Ticker(selected_stock)
-            hist_data = ticker.history(period="1y")
+            hist_data = fetch_ticker_history(selected_stock, period="1y")
 
             if not hist_data.empty:
                 # Prepare data for forecasting
@@ -308,7 +310,8 @@ with tab4:
                 hist_data["ds"] = hist_data["Date"].dt.tz_localize(None)  # Remove timezone
                 hist_data["y"] = hist_data["Close"]
 
-                # Fit Prophet model
+                # Fit Prophet model (imported here since it is slow to load and only used for forecasts)
+                from prophet import Prophet
                 model = Prophet()
                 model.fit(hist_data[["ds", "y"]])
 
@@ -1,10 +1,10 @@
-import sqlite3
 import streamlit as st
 import pandas as pd
 from streamlit_option_menu import option_menu
+from database import get_connection
 
 # Establish database connection for goals
-conn = sqlite3.connect('Main/data/expenses.db', check_same_thread=False)
+conn = get_connection('Main/data/expenses.db')
 cur = conn.cursor()
 
 if "user" not in st.session_state or st.session_state["user"] is None:
@@ -51,22 +51,20 @@ def goals_page(cur, conn):
         # Fetch goals from the database for the logged-in user
         try:
             goals_query = '''
-            SELECT id, goal_amount, saved_amount, description
+            SELECT id AS ID, goal_amount AS "Goal Amount", saved_amount AS "Saved Amount", description AS Description
             FROM goals
             WHERE owner = ?;
             '''
-            goals = cur.execute(goals_query, (st.session_state.get("username", ""),)).fetchall()
+            goals_df = pd.read_sql_query(goals_query, conn, params=(st.session_state.get("username", ""),))
         except Exception:
-            goals = []
+            goals_df = pd.DataFrame()
 
-        if goals:
-            # Convert goals to DataFrame
-            goals_df = pd.DataFrame(goals, columns=["ID", "Goal Amount", "Saved Amount", "Description"])
+        if not goals_df.empty:
             goals_df.insert(0, "Sr No", range(1, len(goals_df) + 1))  # Add serial column
             goals_df["Progress (%)"] = (goals_df["Saved Amount"] / goals_df["Goal Amount"] * 100).round(2)
 
             # Display goals in a table
-            st.write(goals_df.drop(columns=["ID"]).to_html(index=False), unsafe_allow_html=True)
+            st.dataframe(goals_df.drop(columns=["ID"]), hide_index=True, use_container_width=True)
 
             # Update Saved Amount Section
             st.subheader("Update Saved Amount")
@@ -3,6 +3,8 @@ from datetime import datetime
 import time
 import streamlit as st
 import pandas as pd
+from database import get_connection, bump_data_version
+from auth import hash_password, check_password
 
 # Ensure user is logged in
 if "user" not in st.session_state or st.session_state["user"] is None:
@@ -17,17 +19,8 @@ with st.sidebar:
             st.rerun()
 
 # Connect to SQLite databases
-def connect_to_db(db_path):
-    """
-    Connect to SQLite database with Write-Ahead Logging (WAL) enabled.
-    """
-    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
-    conn.execute("PRAGMA journal_mode=WAL;")  # Enable WAL mode for concurrency
-    conn.execute("PRAGMA synchronous=NORMAL;")  # Reduce synchronous overhead
-    return conn
-
-users_conn = connect_to_db('Main/data/users.db')
-income_conn = connect_to_db('Main/data/income.db')
+users_conn = get_connection('Main/data/users.db')
+income_conn = get_connection('Main/data/income.db')
 
 # Initialize session state
 if "user" not in st.session_state:
@@ -95,17 +88,17 @@ def add_income(owner, amount, source, date, description):
     """
     query = "INSERT INTO income (owner, amount, source, date, description) VALUES (?, ?, ?, ?, ?)"
     execute_with_retry(income_conn, query, (owner, amount, source, date, description))
+    bump_data_version(owner)
 
 def get_incomes(owner):
     """
     Fetch all income records for a given owner.
     """
-    query = "SELECT id, amount, source, date, description FROM income WHERE owner = ?"
-    cur = income_conn.cursor()
-    try:
-        return cur.execute(query, (owner,)).fetchall()
-    finally:
-        cur.close()
+    query = """
+    SELECT id AS ID, amount AS Amount, source AS Source, date AS Date, description AS Description
+    FROM income WHERE owner = ?
+    """
+    return pd.read_sql_query(query, income_conn, params=(owner,))
 
 def edit_income(income_id, new_amount, new_source, new_date, new_description):
     """
@@ -126,7 +119,7 @@ def validate_old_password(old_password, username):
     cur = users_conn.cursor()
     try:
         stored_password = cur.execute(query, (username,)).fetchone()
-        return stored_password and stored_password[0] == old_password
+        return bool(stored_password) and check_password(old_password, stored_password[0])
     finally:
         cur.close()
 
@@ -143,6 +136,8 @@ def update_user(name, username, email, new_password, old_username):
         finally:
             cur.close()
         new_password = current_password
+    else:
+        new_password = hash_password(new_password)
 
     # Perform the update
     query = "UPDATE users SET name = ?, username = ?, email = ?, password = ? WHERE username = ?"
@@ -223,16 +218,11 @@ def profile_page():
 
     # View and Edit Income Section
     st.subheader("Your Incomes")
-    incomes = get_incomes(owner)
+    income_df = get_incomes(owner)
 
-    if incomes:
+    if not income_df.empty:
         # Display incomes in a table with serial numbers
-        income_df = pd.DataFrame(
-            incomes,
-            columns=["ID", "Amount", "Source", "Date", "Description"]
-        ).reset_index()
-        income_df.rename(columns={"index": "Sr. No"}, inplace=True)
-        income_df["Sr. No"] += 1  # Start Sr. No from 1
+        income_df.insert(0, "Sr. No", range(1, len(income_df) + 1))  # Start Sr. No from 1
         st.table(income_df[["Sr. No", "Amount", "Source", "Date", "Description"]])
 
         with st.form("edit_income_form"):
@@ -260,6 +250,7 @@ def profile_page():
                     new_date, 
                     new_description
                 )
+                bump_data_version(owner)
                 st.success("Income record updated successfully!")
                 st.rerun()
     else:
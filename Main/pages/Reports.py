@@ -1,13 +1,12 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 from datetime import datetime, timedelta
 import plotly.express as px
-from prophet import Prophet
 import base64
 from fpdf import FPDF
 import io
 import os
+from database import get_connection
 
 # Ensure user is logged in
 if "user" not in st.session_state or st.session_state["user"] is None:
@@ -22,8 +21,11 @@ with st.sidebar:
             st.rerun()
 
 # Database connections
-expenses_conn = sqlite3.connect('Main/data/expenses.db', check_same_thread=False)
-income_conn = sqlite3.connect('Main/data/income.db', check_same_thread=False)
+expenses_conn = get_connection('Main/data/expenses.db')
+income_conn = get_connection('Main/data/income.db')
+
+# Column dtypes for fetched rows: repeated labels as categoricals, free text as Arrow strings
+REPORT_DTYPES = {"amount": "float64", "category": "category", "description": "string[pyarrow]"}
 
 def get_data(owner, start_date, end_date):
     """Fetch expense and income data for the specified period"""
@@ -36,7 +38,8 @@ def get_data(owner, start_date, end_date):
     expenses_df = pd.read_sql_query(
         expenses_query, 
         expenses_conn, 
-        params=(owner, start_date, end_date)
+        params=(owner, start_date, end_date),
+        dtype=REPORT_DTYPES
     )
     
     # Fetch income
@@ -48,7 +51,8 @@ def get_data(owner, start_date, end_date):
     income_df = pd.read_sql_query(
         income_query, 
         income_conn, 
-        params=(owner, start_date, end_date)
+        params=(owner, start_date, end_date),
+        dtype=REPORT_DTYPES
     )
     
     return expenses_df, income_df
@@ -58,6 +62,9 @@ def generate_forecast(data, periods=30):
     if len(data) < 5:  # Need minimum data points for forecasting
         return None
     
+    # Prophet is slow to import, so load it only when a forecast is actually fitted
+    from prophet import Prophet
+
     # Prepare data for Prophet
     df = data.copy()
     df['ds'] = pd.to_datetime(df['date'])
@@ -129,7 +136,7 @@ def create_pdf_report(owner, start_date, end_date, expenses_df, income_df, expen
     pdf.set_font('Arial', 'B', 14)
     pdf.cell(0, 10, 'Income Analysis', 0, 1, 'L')
     pdf.set_font('Arial', '', 12)
-    income_by_category = income_df.groupby('category')['amount'].sum()
+    income_by_category = income_df.groupby('category', observed=True)['amount'].sum()
     top_income_source = income_by_category.idxmax() if not income_by_category.empty else "N/A"
     
     income_text = (
@@ -148,7 +155,7 @@ def create_pdf_report(owner, start_date, end_date, expenses_df, income_df, expen
     pdf.set_font('Arial', 'B', 14)
     pdf.cell(0, 10, 'Expense Analysis', 0, 1, 'L')
     pdf.set_font('Arial', '', 12)
-    expense_by_category = expenses_df.groupby('category')['amount'].sum()
+    expense_by_category = expenses_df.groupby('category', observed=True)['amount'].sum()
     top_expense = expense_by_category.idxmax() if not expense_by_category.empty else "N/A"
     
     expense_text = (
@@ -339,9 +346,14 @@ def main():
     
     # Time series analysis
     st.subheader("Income vs Expenses Over Time")
-    expenses_df['type'] = 'Expense'
-    income_df['type'] = 'Income'
-    combined_df = pd.concat([expenses_df, income_df])
+    # Only the plotted columns are combined; category/description are left out of the concat
+    combined_df = pd.concat(
+        [
+            expenses_df[['date', 'amount']].assign(type='Expense'),
+            income_df[['date', 'amount']].assign(type='Income'),
+        ],
+        ignore_index=True,
+    )
     
     fig_timeline = px.line(
         combined_df,